@@ -1,7 +1,7 @@
 # pomodoro_timer.py
 import streamlit as st
+import math
 import time
-import datetime
 
 # --- Configuration (Default Values) ---
 DEFAULT_WORK_MINUTES = 25
@@ -9,29 +9,68 @@ DEFAULT_SHORT_BREAK_MINUTES = 5
 DEFAULT_LONG_BREAK_MINUTES = 15
 POMODOROS_BEFORE_LONG_BREAK = 4
 
+# Default durations in seconds, in (Work, Short Break, Long Break) order
+DEFAULT_DURATIONS = (
+    DEFAULT_WORK_MINUTES * 60,
+    DEFAULT_SHORT_BREAK_MINUTES * 60,
+    DEFAULT_LONG_BREAK_MINUTES * 60,
+)
+# Index of each mode's duration in the session state durations tuple
+MODE_IDX = {"Work": 0, "Short Break": 1, "Long Break": 2}
+
+# --- Display Templates ---
+MODE_COLORS = {"Work": "red", "Short Break": "green", "Long Break": "green"}
+MODE_HEADER = {mode: f"Current Mode: :{color}[{mode}]" for mode, color in MODE_COLORS.items()}
+# Styling lives in a stylesheet injected outside the fragment, so each tick only sends the bare element.
+# The selector has to outrank Streamlit's own markdown heading rules, which the old inline style always did.
+TIMER_CSS = "<style>.stMarkdown h1.big-timer { text-align: center; font-size: 6em; }</style>"
+TIMER_HTML = "<h1 class='big-timer'>%s</h1>"
+# Toast (message, icon) shown when entering each mode; break messages take the Pomodoro count
+SWITCH_TOASTS = {
+    "Work": ("Break's over! Back to work.", "💪"),
+    "Short Break": ("Pomodoro %d done! Time for a short break.", "👍"),
+    "Long Break": ("Pomodoro %d done! Time for a long break.", "🎉"),
+}
+FOOTER_MD = """
+**How to Use:**
+1.  Adjust durations in the sidebar (optional). Click 'Apply Settings' to save.
+2.  Click 'Start' to begin the timer.
+3.  Use 'Pause' to temporarily stop, and 'Start' again to resume.
+4.  'Reset Phase' restarts the *current* work or break period.
+5.  'Skip Phase' ends the current period and moves to the next one.
+6.  'Reset Full Pomodoro Cycle' in the sidebar restarts the entire cycle count.
+"""
+
 # --- Session State Initialization ---
 # Use session state to preserve variables across reruns
 def initialize_state():
-    if 'initialized' not in st.session_state:
-        st.session_state.initialized = True
-        st.session_state.timer_running = False
-        st.session_state.current_mode = "Work"  # Initial mode
-        # Store durations in seconds
-        st.session_state.work_duration = DEFAULT_WORK_MINUTES * 60
-        st.session_state.short_break_duration = DEFAULT_SHORT_BREAK_MINUTES * 60
-        st.session_state.long_break_duration = DEFAULT_LONG_BREAK_MINUTES * 60
-        st.session_state.pomodoros_completed = 0
-        # Set initial remaining time based on the starting mode
-        st.session_state.remaining_time = st.session_state.work_duration
-        # print("State Initialized") # For debugging
-
-# Ensure state is initialized only once
+    st.session_state.setdefault("timer_running", False)
+    st.session_state.setdefault("current_mode", "Work")  # Initial mode
+    # Store durations in seconds
+    st.session_state.setdefault("durations", DEFAULT_DURATIONS)
+    st.session_state.setdefault("pomodoros_completed", 0)
+    # Remaining time while the timer is stopped, based on the starting mode
+    st.session_state.setdefault("paused_remaining", st.session_state.durations[MODE_IDX["Work"]])
+    # Wall-clock (monotonic) time at which the running phase ends
+    st.session_state.setdefault("deadline", None)
+
+# Fill in any missing state keys; existing values are left untouched
 initialize_state()
 
 # --- Helper Functions ---
 def format_time(seconds):
     """Formats seconds into MM:SS or HH:MM:SS"""
-    return str(datetime.timedelta(seconds=int(seconds)))
+    hours, rest = divmod(int(seconds), 3600)
+    minutes, secs = divmod(rest, 60)
+    if hours:
+        return f"{hours:d}:{minutes:02d}:{secs:02d}"
+    return f"{minutes:02d}:{secs:02d}"
+
+def current_remaining():
+    """Returns the seconds left in the current phase, derived from the deadline while running."""
+    if not st.session_state.timer_running:
+        return st.session_state.paused_remaining
+    return max(0.0, st.session_state.deadline - time.monotonic())
 
 def switch_mode():
     """Switches the timer mode based on Pomodoro rules."""
@@ -43,47 +82,48 @@ def switch_mode():
         pomodoros_completed += 1 # Use updated value for check
         if pomodoros_completed % POMODOROS_BEFORE_LONG_BREAK == 0:
             st.session_state.current_mode = "Long Break"
-            st.session_state.remaining_time = st.session_state.long_break_duration
-            st.toast(f"Pomodoro {pomodoros_completed} done! Time for a long break.", icon="🎉")
         else:
             st.session_state.current_mode = "Short Break"
-            st.session_state.remaining_time = st.session_state.short_break_duration
-            st.toast(f"Pomodoro {pomodoros_completed} done! Time for a short break.", icon="👍")
     else:  # If current mode is Short Break or Long Break
         st.session_state.current_mode = "Work"
-        st.session_state.remaining_time = st.session_state.work_duration
-        st.toast("Break's over! Back to work.", icon="💪")
 
+    message, icon = SWITCH_TOASTS[st.session_state.current_mode]
+    if current_mode == "Work":
+        message = message % pomodoros_completed
+    st.toast(message, icon=icon)
+
+    st.session_state.paused_remaining = st.session_state.durations[MODE_IDX[st.session_state.current_mode]]
     st.session_state.timer_running = False # Stop timer automatically when mode switches
+    st.session_state.deadline = None
 
 def start_timer():
     """Starts the timer if time is remaining."""
-    if st.session_state.remaining_time > 0:
+    if st.session_state.paused_remaining > 0:
         st.session_state.timer_running = True
+        st.session_state.deadline = time.monotonic() + st.session_state.paused_remaining
         # print("Timer Started") # For debugging
 
 def pause_timer():
     """Pauses the timer."""
+    if st.session_state.timer_running:
+        st.session_state.paused_remaining = current_remaining()
     st.session_state.timer_running = False
+    st.session_state.deadline = None
     # print("Timer Paused") # For debugging
 
 def reset_current_timer():
     """Resets the timer to the beginning of the current mode."""
     st.session_state.timer_running = False
-    mode = st.session_state.current_mode
-    if mode == "Work":
-        st.session_state.remaining_time = st.session_state.work_duration
-    elif mode == "Short Break":
-        st.session_state.remaining_time = st.session_state.short_break_duration
-    elif mode == "Long Break":
-        st.session_state.remaining_time = st.session_state.long_break_duration
+    st.session_state.deadline = None
+    st.session_state.paused_remaining = st.session_state.durations[MODE_IDX[st.session_state.current_mode]]
     # print("Current Timer Reset") # For debugging
 
 def reset_cycle():
      """Resets the entire pomodoro cycle and count."""
      st.session_state.timer_running = False
+     st.session_state.deadline = None
      st.session_state.current_mode = "Work"
-     st.session_state.remaining_time = st.session_state.work_duration
+     st.session_state.paused_remaining = st.session_state.durations[MODE_IDX["Work"]]
      st.session_state.pomodoros_completed = 0
      st.toast("Pomodoro cycle reset.")
      # print("Full Cycle Reset") # For debugging
@@ -97,37 +137,38 @@ st.title("🍅 Pomodoro Timer")
 # --- Sidebar for Configuration ---
 with st.sidebar:
     st.header("⚙️ Settings")
-
-    work_minutes = st.number_input(
-        "Work Duration (minutes)",
-        min_value=1,
-        value=st.session_state.work_duration // 60, # Display in minutes
-        step=5,
-        key="work_min_input" # Use key to prevent issues with state updates
-    )
-    short_break_minutes = st.number_input(
-        "Short Break Duration (minutes)",
-        min_value=1,
-        value=st.session_state.short_break_duration // 60,
-        step=1,
-        key="short_break_min_input"
-    )
-    long_break_minutes = st.number_input(
-        "Long Break Duration (minutes)",
-        min_value=1,
-        value=st.session_state.long_break_duration // 60,
-        step=5,
-        key="long_break_min_input"
-    )
+    work_duration, short_break_duration, long_break_duration = st.session_state.durations
+
+    # Group the inputs in a form so adjusting them doesn't rerun the app until applied
+    with st.form("settings", clear_on_submit=False):
+        work_minutes = st.number_input(
+            "Work Duration (minutes)",
+            min_value=1,
+            value=work_duration // 60, # Display in minutes
+            step=5,
+            key="work_min_input" # Use key to prevent issues with state updates
+        )
+        short_break_minutes = st.number_input(
+            "Short Break Duration (minutes)",
+            min_value=1,
+            value=short_break_duration // 60,
+            step=1,
+            key="short_break_min_input"
+        )
+        long_break_minutes = st.number_input(
+            "Long Break Duration (minutes)",
+            min_value=1,
+            value=long_break_duration // 60,
+            step=5,
+            key="long_break_min_input"
+        )
+        submitted = st.form_submit_button("Apply Settings & Reset Current Timer")
 
     # Apply settings button - updates state and resets *current* timer
-    if st.button("Apply Settings & Reset Current Timer"):
-        st.session_state.work_duration = work_minutes * 60
-        st.session_state.short_break_duration = short_break_minutes * 60
-        st.session_state.long_break_duration = long_break_minutes * 60
+    if submitted:
+        st.session_state.durations = (work_minutes * 60, short_break_minutes * 60, long_break_minutes * 60)
         reset_current_timer() # Reset to apply new duration if it's the current mode
-        st.success("Settings applied. Current timer phase reset.")
-        time.sleep(1) # Give user time to see message
+        st.toast("Settings applied. Current timer phase reset.", icon="✅") # Toasts survive the rerun
         st.rerun() # Rerun to reflect changes immediately
 
     st.divider()
@@ -136,76 +177,71 @@ with st.sidebar:
 # --- Main Timer Display ---
 
 # Display current mode and pomodoros completed
-mode_color = "red" if st.session_state.current_mode == "Work" else "green"
-st.header(f"Current Mode: :{mode_color}[{st.session_state.current_mode}]")
+st.header(MODE_HEADER[st.session_state.current_mode])
 st.metric(label="Pomodoros Completed", value=st.session_state.pomodoros_completed)
 
-# --- Timer Display Placeholder ---
-# Use a placeholder to update the time without rewriting other elements
-timer_placeholder = st.empty()
-timer_placeholder.markdown(f"<h1 style='text-align: center; font-size: 6em;'>{format_time(st.session_state.remaining_time)}</h1>", unsafe_allow_html=True)
-
-# --- Control Buttons ---
-# Arrange buttons horizontally
-col1, col2, col3 = st.columns(3)
-
-with col1:
-    if not st.session_state.timer_running:
-        st.button("▶️ Start", on_click=start_timer, key="start", use_container_width=True, type="primary", disabled=(st.session_state.remaining_time <= 0))
-    else:
-        st.button("⏸️ Pause", on_click=pause_timer, key="pause", use_container_width=True)
-
-with col2:
-    st.button("🔄 Reset Phase", on_click=reset_current_timer, key="reset", use_container_width=True, help="Resets the timer to the start of the current Work/Break phase.")
-
-with col3:
-     # Add a skip button only when timer might be running or paused
-     st.button("⏩ Skip Phase", on_click=switch_mode, key="skip", use_container_width=True, type="secondary", help="Finish current phase immediately and move to the next.")
-
-
-# --- Timer Logic Loop ---
-# This part runs only when the timer is active
-if st.session_state.timer_running:
-    while st.session_state.remaining_time > 0 and st.session_state.timer_running:
-        # Update display in the placeholder
-        timer_placeholder.markdown(f"<h1 style='text-align: center; font-size: 6em;'>{format_time(st.session_state.remaining_time)}</h1>", unsafe_allow_html=True)
-
-        # Decrement time
-        st.session_state.remaining_time -= 1
-
-        # Wait for 1 second - This is the core timing mechanism
-        time.sleep(1)
-
-        # Need to rerun to check button states and update the display loop
-        # Check if timer was stopped by pause/reset button during sleep
-        if not st.session_state.timer_running:
-            break
-
-    # After the loop (timer finished or was stopped)
-    # Ensure final display is accurate
-    timer_placeholder.markdown(f"<h1 style='text-align: center; font-size: 6em;'>{format_time(st.session_state.remaining_time)}</h1>", unsafe_allow_html=True)
-
-    # --- Handle Timer Finish ---
-    # Check if timer actually finished naturally (wasn't paused/reset)
-    if st.session_state.remaining_time <= 0 and st.session_state.timer_running:
+# Timer stylesheet, sent once per full run ahead of the timer it styles
+st.markdown(TIMER_CSS, unsafe_allow_html=True)
+
+# --- Timer Panel ---
+# Only this fragment reruns on each tick, so the sidebar, header and footer
+# are not re-rendered every second. It ticks only while the timer is running;
+# run_every is only re-read on a full app run, so stopping the timer needs one.
+@st.fragment(run_every="1s" if st.session_state.timer_running else None)
+def timer_panel():
+    # --- Timer Logic ---
+    # Derive the remaining time from the deadline instead of blocking the
+    # script thread with time.sleep()
+    remaining = current_remaining()
+    if st.session_state.timer_running and remaining <= 0:
         # Timer has reached zero
         # Optional: Add sound alert here if desired (requires more setup)
         # st.audio("path/to/alert.wav") # Example
 
         switch_mode() # Switch to the next mode
-        st.rerun() # Rerun immediately to show the new mode and reset timer display
+        st.rerun() # Rerun the whole app; the new run draws the next phase's time
+    else:
+        # --- Timer Display ---
+        # Written once per fragment run, and not at all on the expiry path
+        st.markdown(TIMER_HTML % format_time(math.ceil(remaining)), unsafe_allow_html=True)
+
+    # --- Control Buttons ---
+    # Arrange buttons horizontally. Widgets inside a fragment only rerun the
+    # fragment. Start, Skip and anything that stops a running timer trigger a
+    # full st.rerun() to refresh the header, metric and tick schedule; Reset
+    # Phase on a stopped timer only reruns the fragment.
+    col1, col2, col3 = st.columns(3)
+
+    with col1:
+        if not st.session_state.timer_running:
+            if st.button("▶️ Start", key="start", use_container_width=True, type="primary", disabled=(remaining <= 0)):
+                start_timer()
+                st.rerun()
+        else:
+            if st.button("⏸️ Pause", key="pause", use_container_width=True):
+                pause_timer()
+                st.rerun() # Full run re-registers the fragment without its tick
+
+    with col2:
+        if st.session_state.timer_running:
+            if st.button("🔄 Reset Phase", key="reset", use_container_width=True, help="Resets the timer to the start of the current Work/Break phase."):
+                reset_current_timer()
+                st.rerun()
+        else:
+            # The callback runs before the fragment rerun the click triggers
+            st.button("🔄 Reset Phase", on_click=reset_current_timer, key="reset", use_container_width=True, help="Resets the timer to the start of the current Work/Break phase.")
+
+    with col3:
+        # Add a skip button only when timer might be running or paused
+        if st.button("⏩ Skip Phase", key="skip", use_container_width=True, type="secondary", help="Finish current phase immediately and move to the next."):
+            switch_mode()
+            st.rerun()
+
+timer_panel()
 
 # --- Instructions / Footer ---
 st.divider()
-st.markdown("""
-**How to Use:**
-1.  Adjust durations in the sidebar (optional). Click 'Apply Settings' to save.
-2.  Click 'Start' to begin the timer.
-3.  Use 'Pause' to temporarily stop, and 'Start' again to resume.
-4.  'Reset Phase' restarts the *current* work or break period.
-5.  'Skip Phase' ends the current period and moves to the next one.
-6.  'Reset Full Pomodoro Cycle' in the sidebar restarts the entire cycle count.
-""")
+st.markdown(FOOTER_MD)
 
 # --- Debugging (Optional) ---
 # Uncomment to see session state changes